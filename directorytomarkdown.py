@@ -1,14 +1,33 @@
-# project_to_markdown.py
+# directorytomarkdown.py
 
 import os
 import argparse
+import codecs
+import collections
+import functools
+import multiprocessing
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+# Optional: for better encoding detection. Prefer cchardet (C extension), then
+# chardet, which share detect() and its confidence scale, then charset_normalizer.
+# The confidence of charset_normalizer's detect() shim is not on that scale, so it
+# is queried through from_bytes() instead (see _charset_normalizer_encoding).
 try:
-    import chardet # Optional: for better encoding detection. Install with: pip install chardet
-    _CHARDET_AVAILABLE = True
+    import cchardet as _detector
 except ImportError:
-    _CHARDET_AVAILABLE = False
-    print("Warning: 'chardet' library not found. Encoding detection will be limited to utf-8/latin-1.")
-    print("Install it with: pip install chardet")
+    try:
+        import chardet as _detector
+    except ImportError:
+        try:
+            import charset_normalizer as _detector
+        except ImportError:
+            _detector = None
+_CHARDET_AVAILABLE = _detector is not None
+_USE_FROM_BYTES = _CHARDET_AVAILABLE and _detector.__name__ == 'charset_normalizer'
+if not _CHARDET_AVAILABLE:
+    print("Warning: No encoding detection library found. Encoding detection will be limited to utf-8/latin-1.")
+    print("Install one with: pip install cchardet (fastest), chardet or charset-normalizer")
 
 # --- Configuration ---
 
@@ -25,13 +44,14 @@ INCLUDED_EXTENSIONS = {
 }
 
 # Add directory names to completely ignore.
-EXCLUDED_DIRECTORIES = {
+# (Hidden directories, starting with '.', are always ignored.)
+EXCLUDED_DIRECTORIES = frozenset({
     '.git', 'node_modules', 'venv', '.venv', 'env', '.env',
     '__pycache__', 'dist', 'build', 'target', 'out',
     '.vscode', '.idea', '.project', '.settings',
     'vendor', 'Pods', 'Carthage',
     # Add or remove as needed
-}
+})
 
 # Add specific file names or extensions to ignore.
 EXCLUDED_FILES_OR_EXTENSIONS = {
@@ -47,6 +67,24 @@ EXCLUDED_FILES_OR_EXTENSIONS = {
     # Add or remove as needed
 }
 
+# Open each directory once and resolve its files relative to the directory's file
+# descriptor (like os.fwalk) instead of re-resolving the full path for every file.
+# Not available on Windows, where files are opened by path instead.
+_HAVE_DIR_FD = os.scandir in os.supports_fd and os.open in os.supports_dir_fd
+
+# Displayed paths use '/', so on POSIX relative paths can be shown as-is
+_SEP_IS_SLASH = os.sep == '/'
+
+# File reads run on a thread pool while the walk continues (the GIL is released
+# during reads); decoding and formatting happen as results are collected, in order.
+# At most _MAX_PENDING_READS results are held before the oldest is collected, which
+# also bounds the number of directory descriptors kept open.
+_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+_MAX_PENDING_READS = _READ_WORKERS * 4
+
+# Files are read with raw os.open/os.read calls (O_BINARY avoids newline translation on Windows)
+_READ_FLAGS = os.O_RDONLY | getattr(os, 'O_BINARY', 0) | getattr(os, 'O_CLOEXEC', 0)
+
 # Mapping from file extension to Markdown language identifier
 LANGUAGE_MAP = {
     '.py': 'python',
@@ -93,55 +131,280 @@ LANGUAGE_MAP = {
     # Add more mappings if needed
 }
 
-def detect_encoding(file_path):
-    """Detect file encoding using chardet, fallback to utf-8."""
+# Returned when a file is neither excluded nor included
+_NOT_INCLUDED = object()
+
+def _decide_file(filename):
+    """
+    Apply the inclusion/exclusion rules above to a file name.
+    Returns None if excluded, _NOT_INCLUDED if not included, otherwise the
+    Markdown language identifier ('' for plain text).
+    """
+    _ , extension = os.path.splitext(filename)
+    extension_lower = extension.lower() # Normalize extension
+    if (filename in EXCLUDED_FILES_OR_EXTENSIONS or
+        (extension_lower and extension_lower in EXCLUDED_FILES_OR_EXTENSIONS)):
+        return None
+    # Handle files without extension (like Dockerfile) or specific included names
+    if filename in INCLUDED_EXTENSIONS:
+        return LANGUAGE_MAP.get(filename, '')
+    if extension_lower in INCLUDED_EXTENSIONS:
+        return LANGUAGE_MAP.get(extension_lower, '')
+    return _NOT_INCLUDED
+
+# Precomputed decisions so each file only needs one or two dict lookups instead of
+# re-checking every set. DECISION_MAP is keyed on the lowercased extension (exclusions
+# are added last so they win); SPECIAL_NAMES covers files matched by their full name
+# (e.g. 'Dockerfile', '.gitignore', 'package-lock.json').
+DECISION_MAP = {ext.lower(): LANGUAGE_MAP.get(ext, '') for ext in INCLUDED_EXTENSIONS}
+DECISION_MAP.update(dict.fromkeys(ext.lower() for ext in EXCLUDED_FILES_OR_EXTENSIONS))
+SPECIAL_NAMES = {name: _decide_file(name) for name in INCLUDED_EXTENSIONS | EXCLUDED_FILES_OR_EXTENSIONS}
+
+def _read_file_bytes(file_path, dir_fd=None):
+    """
+    Read a whole file in as few system calls as possible: open, fstat, one read
+    sized from the file size, close. A buffered file object would add ioctl/lseek
+    calls on open and an extra read to find EOF.
+    If dir_fd is given, file_path is relative to that directory descriptor.
+    """
+    fd = os.open(file_path, _READ_FLAGS, dir_fd=dir_fd)
+    try:
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size + 1) # One extra byte shows whether the file has grown
+        if len(data) != size:
+            # Short read, or the size changed since fstat: read until EOF
+            chunks = [data]
+            while True:
+                chunk = os.read(fd, 1 << 16)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            data = b"".join(chunks)
+        return data
+    finally:
+        os.close(fd)
+
+def _bom_encoding(raw_data):
+    """Return the encoding indicated by a byte order mark at the start of raw_data, or None."""
+    if raw_data[:3] == codecs.BOM_UTF8:
+        return 'utf-8-sig'
+    # UTF-32 first, its little-endian BOM starts like UTF-16's
+    if raw_data[:4] in (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE):
+        return 'utf-32'
+    if raw_data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    return None
+
+@functools.lru_cache(maxsize=None)
+def _is_single_byte_encoding(encoding):
+    """
+    Return True if encoding maps every byte to a character on its own (latin-1,
+    cp1251, ...). Such codecs decode almost any input, so succeeding says little.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)('replace')
+    except LookupError:
+        return False
+    # Multi-byte codecs hold back a lead byte until the rest of the character arrives
+    return all(decoder.decode(bytes((byte,))) for byte in range(0x80, 0x100))
+
+def _charset_normalizer_encoding(raw_data):
+    """Return charset_normalizer's guess for raw_data, or None if it is not trustworthy."""
+    best = _detector.from_bytes(raw_data).best()
+    # Wrong single-byte guesses (cp1257 for Latin-1 French, ...) score as well as
+    # right ones, so only multi-byte results that decode cleanly are taken.
+    if best is None or best.chaos > 0.1 or _is_single_byte_encoding(best.encoding):
+        return None
+    return best.encoding
+
+def detect_encoding(raw_data, file_path):
+    """
+    Detect the encoding of a file's bytes using cchardet/charset_normalizer/chardet,
+    fallback to utf-8. file_path is only used in messages.
+    """
+    raw_data = raw_data[:5000] # Use the first 5KB to guess encoding
+    if not raw_data: # Handle empty files
+         return 'utf-8'
+    # Fast paths for the common cases, which need no detection library:
+    # byte order marks...
+    bom_encoding = _bom_encoding(raw_data)
+    if bom_encoding is not None:
+        return bom_encoding
+    # ...then plain ASCII and valid UTF-8, which covers most source files
+    if raw_data.isascii():
+        return 'utf-8'
+    try:
+        # final=False: the 5KB sample may end in the middle of a character
+        codecs.utf_8_decode(raw_data, 'strict', False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass # Not UTF-8, let the detector guess
+
     if not _CHARDET_AVAILABLE:
         return 'utf-8' # Chardet not available, return default
 
     try:
-        with open(file_path, 'rb') as f:
-            raw_data = f.read(5000) # Read first 5KB to guess encoding
-            if not raw_data: # Handle empty files
-                 return 'utf-8'
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-            confidence = result['confidence']
-            # Provide default if detection fails or is uncertain (e.g., < 70% confidence)
-            # Adjust confidence threshold as needed
-            return encoding if encoding and confidence > 0.7 else 'utf-8'
+        if _USE_FROM_BYTES:
+            return _charset_normalizer_encoding(raw_data) or 'utf-8'
+        result = _detector.detect(raw_data)
+        encoding = result['encoding']
+        confidence = result['confidence']
+        # Provide default if detection fails or is uncertain (e.g., < 70% confidence)
+        # Adjust confidence threshold as needed
+        return encoding if encoding and confidence > 0.7 else 'utf-8'
     except Exception as e:
         print(f"Warning: Encoding detection failed for {file_path}. Error: {e}. Falling back to utf-8.")
         return 'utf-8' # Fallback to utf-8 on any error
 
-def get_file_content(file_path):
-    """Read content of a file, trying different encodings."""
-    encodings_to_try = ['utf-8']
-    detected_encoding = detect_encoding(file_path)
-    if detected_encoding not in encodings_to_try:
-        encodings_to_try.append(detected_encoding)
+# Encoding the detector found for a non-UTF-8 file, keyed on its directory. Files in
+# the same directory almost always share an encoding, so siblings reuse it: before
+# running detection again if it is multi-byte, otherwise only when the detector has
+# no confident answer (a single-byte codec decodes anything, so succeeding proves
+# nothing). Only detector results are cached: the latin-1 fallback decodes
+# anything, and a BOM only describes the file it starts.
+# Cleared by process_directory.
+_dir_encoding_cache = {}
+
+def _fallback_encodings(raw_data, file_path, directory):
+    """
+    Yield (encoding, from_detector) pairs to try after UTF-8 has failed: the
+    encoding given by a byte order mark, the multi-byte encoding detected for an
+    earlier file in the same directory (if any), a freshly detected one (only
+    computed if still needed), or failing that a single-byte encoding detected for
+    an earlier file, then latin-1.
+    """
+    tried = {'utf-8'}
+    bom_encoding = _bom_encoding(raw_data)
+    if bom_encoding is not None:
+        tried.add(bom_encoding)
+        yield bom_encoding, False
+
+    cached_encoding = _dir_encoding_cache.get(directory)
+    if cached_encoding is not None and not _is_single_byte_encoding(cached_encoding):
+        if cached_encoding not in tried:
+            tried.add(cached_encoding)
+            yield cached_encoding, False
+        cached_encoding = None
+
+    detected_encoding = detect_encoding(raw_data, file_path)
+    if detected_encoding not in tried:
+        tried.add(detected_encoding)
+        yield detected_encoding, True
+    elif cached_encoding is not None and cached_encoding not in tried:
+        # No confident guess for this file: go with what its siblings used
+        tried.add(cached_encoding)
+        yield cached_encoding, False
+
     # Add latin-1 as a common fallback
-    if 'latin-1' not in encodings_to_try:
-        encodings_to_try.append('latin-1')
+    if 'latin-1' not in tried:
+        yield 'latin-1', False
 
-    last_exception = None
-    for encoding in encodings_to_try:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                return f.read()
-        except UnicodeDecodeError as e:
-            last_exception = e
-            # print(f"Debug: Failed to decode {file_path} with {encoding}.") # Optional debug print
-            continue # Try next encoding
-        except (IOError, OSError) as e:
-            print(f"Error: Could not read file {file_path}. Skipping. Reason: {e}")
-            return None
-        except Exception as e: # Catch other potential file reading errors
-            print(f"Error: An unexpected error occurred while reading {file_path} with encoding {encoding}. Skipping. Reason: {e}")
+def _read_file_reporting_errors(file_path, dir_fd=None, message_path=None):
+    """
+    Return a file's bytes, or None (after printing why) if it could not be read.
+    message_path is the path shown in messages (defaults to file_path, which is
+    only a bare name when it is relative to dir_fd).
+    """
+    if message_path is None:
+        message_path = file_path
+    try:
+        return _read_file_bytes(file_path, dir_fd)
+    except (IOError, OSError) as e:
+        print(f"Error: Could not read file {message_path}. Skipping. Reason: {e}")
+        return None
+    except Exception as e: # Catch other potential file reading errors
+        print(f"Error: An unexpected error occurred while reading {message_path}. Skipping. Reason: {e}")
+        return None
+
+def _decode_content(raw_data, file_path, as_utf8=False, directory=None):
+    """Decode a file's bytes for get_file_content (see there for the arguments)."""
+    if as_utf8 and raw_data.isascii() and b'\r' not in raw_data:
+        return raw_data # Nothing to decode or translate
+
+    encodings_to_try = ['utf-8']
+    content_is_raw_data = False # True if content is exactly raw_data decoded as UTF-8
+    try:
+        content = raw_data.decode('utf-8')
+        content_is_raw_data = True
+    except UnicodeDecodeError as e:
+        # Only worth detecting the encoding once UTF-8 has failed
+        last_exception = e
+        content = None
+        for encoding, from_detector in _fallback_encodings(raw_data, file_path, directory):
+            encodings_to_try.append(encoding)
+            try:
+                content = raw_data.decode(encoding)
+                if from_detector and directory is not None:
+                    _dir_encoding_cache[directory] = encoding
+                break
+            except UnicodeDecodeError as e:
+                last_exception = e
+                # print(f"Debug: Failed to decode {file_path} with {encoding}.") # Optional debug print
+                continue # Try next encoding
+            except Exception as e: # Catch other potential decoding errors (e.g. unknown encoding)
+                print(f"Error: An unexpected error occurred while reading {file_path} with encoding {encoding}. Skipping. Reason: {e}")
+                return None
+
+        if content is None:
+            # If all attempts failed
+            print(f"Error: Could not decode file {file_path} with tried encodings: {encodings_to_try}. Skipping. Last error: {last_exception}")
             return None
 
-    # If all attempts failed
-    print(f"Error: Could not decode file {file_path} with tried encodings: {encodings_to_try}. Skipping. Last error: {last_exception}")
-    return None
+    # Translate line endings the way reading in text mode (universal newlines) does
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+        content_is_raw_data = False
+
+    if as_utf8:
+        return raw_data if content_is_raw_data else content.encode('utf-8')
+    return content
+
+def get_file_content(file_path, dir_fd=None, as_utf8=False, directory=None):
+    """
+    Read content of a file, trying different encodings.
+    The file is read once and every encoding is tried on the bytes in memory.
+    If dir_fd is given, file_path is relative to that directory descriptor.
+    If as_utf8 is true, the content is returned as UTF-8 encoded bytes; files that
+    are already UTF-8 with '\n' line endings are returned as read, without re-encoding.
+    If directory is given, an encoding detected for a non-UTF-8 file is tried first
+    for later files passing the same directory.
+    """
+    raw_data = _read_file_reporting_errors(file_path, dir_fd)
+    if raw_data is None:
+        return None
+    return _decode_content(raw_data, file_path, as_utf8, directory)
+
+
+# Header line and opening fence of each file block, filled with (path, language)
+_FILE_BANNER = "--- File: %s ---\n```%s\n"
+
+def _format_block(path_for_display, language, content):
+    """Return the Markdown block for a file's UTF-8 encoded content."""
+    block = [(_FILE_BANNER % (path_for_display, language)).encode('utf-8'), content]
+    # Ensure the code block fence is on a new line if the content doesn't end with one
+    if content and content[-1:] != b'\n': # Check if content is not empty
+        block.append(b'\n')
+    block.append(b"```\n\n") # Add extra newline for spacing
+    return b"".join(block)
+
+def _collect_oldest_read(pending, out):
+    """
+    Wait for the oldest pending read, then decode it and write its block to the
+    output file. Decoding happens here, in walk order, rather than on the pool
+    threads, so the encoding cache is filled and consulted in a deterministic order
+    (detection is pure Python that holds the GIL, so threads would not speed it up).
+    """
+    future, file_path, directory, path_for_display, language, dir_fd = pending.popleft()
+    try:
+        raw_data = future.result()
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd) # This was the last read relative to the directory
+    if raw_data is None:
+        return
+    content = _decode_content(raw_data, file_path, as_utf8=True, directory=directory)
+    if content is not None:
+        out.write(_format_block(path_for_display, language, content))
 
 
 def create_llm_header(input_dir_abs_path):
@@ -165,108 +428,221 @@ def create_llm_header(input_dir_abs_path):
     return header
 
 
-def process_directory(input_dir, output_file):
+def _write_directory_files(out, input_dir, top_dir, top_rel_dir, abs_output_file, subdirs_out=None):
+    """
+    Traverse top_dir (an absolute path, top_rel_dir relative to the input directory)
+    and write the Markdown block of every included file to the open output file,
+    skipping the output file itself.
+    If subdirs_out is a list, only top_dir's own files are written and its
+    subdirectories are appended to subdirs_out as (path, rel_dir) pairs instead.
+    """
+    # Use a set to track processed files to avoid duplicates if symlinks create loops (though EXCLUDED_DIRECTORIES helps)
+    processed_files = set()
+
+    # (future, file_path, directory, path_for_display, language, dir_fd) in output order;
+    # dir_fd is only set on the last read of a directory, so the descriptor is closed
+    # once every read relative to it is done
+    pending = collections.deque()
+    current_dir_fd = None # Descriptor of the directory being scanned, until handed to pending
+
+    try:
+        with ThreadPoolExecutor(max_workers=_READ_WORKERS) as executor:
+            # Bind methods used for every file once, saving an attribute lookup per call
+            special_names_get = SPECIAL_NAMES.get
+            decision_get = DECISION_MAP.get
+            mark_processed = processed_files.add
+            submit_read = executor.submit
+            add_pending = pending.append
+
+            # Walk the tree with os.scandir instead of os.walk so the file type information
+            # cached on each DirEntry can be reused instead of re-stat'ing every file.
+            # Each stack item is (directory path, path relative to the input directory).
+            dirs_to_visit = [(top_dir, top_rel_dir)]
+
+            while dirs_to_visit:
+                root, rel_dir = dirs_to_visit.pop()
+
+                subdirs = []
+                files = []
+                dir_fd = None
+                try:
+                    if _HAVE_DIR_FD:
+                        dir_fd = current_dir_fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+                    # When scanning a descriptor, DirEntry.path is just the entry name
+                    with os.scandir(root if dir_fd is None else dir_fd) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False): # Avoid following symlinks by default
+                                # --- Directory Exclusion ---
+                                # Cheap hidden-dir test first, it also covers most EXCLUDED_DIRECTORIES
+                                name = entry.name
+                                if name[:1] != '.' and name not in EXCLUDED_DIRECTORIES: # Also exclude hidden dirs
+                                    subdirs.append(entry)
+                            else:
+                                files.append(entry)
+                except OSError as e:
+                    if dir_fd is not None:
+                        os.close(dir_fd)
+                        current_dir_fd = None
+                    print(f"Warning: Could not scan directory {root}. Skipping. Reason: {e}")
+                    continue
+
+                # Join once per directory and concatenate names onto it (as os.walk does)
+                root_prefix = os.path.join(root, '')
+                rel_prefix = rel_dir + os.sep if rel_dir else '' # Avoid './' prefix for root files
+
+                if subdirs_out is not None:
+                    subdirs_out.extend((root_prefix + entry.name, rel_prefix + entry.name) for entry in subdirs)
+                else:
+                    # Push subdirectories in reverse so they are visited in listing order (like os.walk)
+                    for entry in reversed(subdirs):
+                        dirs_to_visit.append((root_prefix + entry.name, rel_prefix + entry.name))
+
+                print(f"Processing directory: {os.path.join(input_dir, rel_dir) if rel_dir else input_dir}")
+
+                # Sort files for consistent order
+                files.sort(key=lambda entry: entry.name)
+
+                reads_submitted = False
+                for entry in files:
+                    filename = entry.name
+                    file_path = root_prefix + filename # Already absolute: root starts at top_dir
+
+                    # Skip if already processed (handles potential symlink complexities)
+                    if file_path in processed_files:
+                        continue
+
+                    # The output file is being written while the scan runs
+                    if file_path == abs_output_file:
+                        continue
+
+                    # Ensure it's actually a file. Symlinks are never followed, so regular files
+                    # need a single check, answered from the directory entry (or one cached lstat)
+                    if not entry.is_file(follow_symlinks=False):
+                        if entry.is_symlink():
+                            print(f"  Skipping symlink: {filename}")
+                        continue
+
+                    rel_file_path = rel_prefix + filename
+                    # Extension without os.path.splitext; a leading dot (like '.gitignore') does not start one
+                    dot_idx = filename.rfind('.')
+                    extension_lower = filename[dot_idx:].lower() if dot_idx > 0 else '' # Normalize extension
+
+                    # Specific file names take priority (like 'Dockerfile'), then the extension
+                    language = special_names_get(filename, _NOT_INCLUDED)
+                    if language is _NOT_INCLUDED:
+                        language = decision_get(extension_lower, _NOT_INCLUDED)
+
+                    # --- File Exclusion ---
+                    if language is None:
+                        print(f"  Skipping excluded file/type: {rel_file_path}")
+                        continue
+
+                    # --- File Inclusion ---
+                    if language is _NOT_INCLUDED:
+                        print(f"  Skipping non-included file type: {rel_file_path}")
+                        continue
+
+                    # --- Read and Format File Content ---
+                    print(f"  Processing file: {rel_file_path}")
+                    mark_processed(file_path) # Mark as processed
+
+                    # Format for Markdown - use forward slashes in paths for consistency
+                    path_for_display = rel_file_path if _SEP_IS_SLASH else rel_file_path.replace(os.sep, '/')
+                    if len(pending) >= _MAX_PENDING_READS:
+                        _collect_oldest_read(pending, out)
+                    # Opened by name relative to dir_fd when available; messages use the full path
+                    read_path = file_path if dir_fd is None else filename
+                    future = submit_read(_read_file_reporting_errors, read_path, dir_fd, file_path)
+                    add_pending((future, file_path, root, path_for_display, language, None))
+                    reads_submitted = True
+
+                if dir_fd is not None:
+                    if reads_submitted:
+                        pending[-1] = pending[-1][:-1] + (dir_fd,) # Closed after its last read
+                    else:
+                        os.close(dir_fd)
+                    current_dir_fd = None
+
+            while pending:
+                _collect_oldest_read(pending, out)
+    finally:
+        # Only reached with descriptors still open if an error stopped the walk; the
+        # executor has already waited for any running reads by this point
+        if current_dir_fd is not None:
+            os.close(current_dir_fd)
+        for *_read, dir_fd in pending:
+            if dir_fd is not None:
+                os.close(dir_fd)
+
+
+def _render_subtree(task):
+    """
+    Worker process entry point: write the Markdown blocks of one directory tree to
+    part_file and return its path.
+    """
+    input_dir, top_dir, top_rel_dir, abs_output_file, part_file = task
+    with open(part_file, 'wb', buffering=1 << 20) as out:
+        _write_directory_files(out, input_dir, top_dir, top_rel_dir, abs_output_file)
+    return part_file
+
+def _write_directory_files_parallel(out, input_dir, abs_input_dir, abs_output_file, jobs):
+    """
+    Like _write_directory_files, but each top-level subdirectory is processed in a
+    separate worker process. The output is in the same order as a serial run.
+    """
+    subdirs = []
+    _write_directory_files(out, input_dir, abs_input_dir, '', abs_output_file, subdirs_out=subdirs)
+    if not subdirs:
+        return
+
+    # Workers write to files rather than returning their output, so no subtree is
+    # ever held in memory. The directory is hidden so the walk never includes it.
+    with tempfile.TemporaryDirectory(prefix='.directorytomarkdown-',
+                                     dir=os.path.dirname(abs_output_file)) as part_dir:
+        tasks = [(input_dir, path, rel_dir, abs_output_file, os.path.join(part_dir, f"{i}.md"))
+                 for i, (path, rel_dir) in enumerate(subdirs)]
+        with multiprocessing.Pool(processes=min(jobs, len(tasks))) as pool:
+            # imap (rather than imap_unordered) keeps the serial order while later
+            # subdirectories are still being processed
+            for part_file in pool.imap(_render_subtree, tasks):
+                with open(part_file, 'rb') as part:
+                    shutil.copyfileobj(part, out, 1 << 20)
+                os.remove(part_file)
+
+
+def process_directory(input_dir, output_file, jobs=1):
     """
     Traverse input directory, read specified files, and write to output file
     with an introductory LLM header.
+    With jobs > 1, top-level subdirectories are processed by that many worker
+    processes (0 means one per CPU), which helps on very large trees.
     """
     if not os.path.isdir(input_dir):
         print(f"Error: Input directory '{input_dir}' not found or is not a directory.")
         return
 
-    abs_input_dir = os.path.abspath(input_dir)
+    if jobs < 0:
+        print(f"Error: jobs must be 0 or more, got {jobs}.")
+        return
 
-    # --- Create LLM Header ---
-    llm_header = create_llm_header(abs_input_dir)
-    output_content = [llm_header] # Initialize the list with the header
+    abs_input_dir = os.path.abspath(input_dir)
+    abs_output_file = os.path.abspath(output_file)
 
     print(f"Starting scan of directory: {abs_input_dir}")
-
-    # Use a set to track processed files to avoid duplicates if symlinks create loops (though EXCLUDED_DIRECTORIES helps)
-    processed_files = set()
-
-    for root, dirs, files in os.walk(abs_input_dir, topdown=True, followlinks=False): # Avoid following symlinks by default
-        # --- Directory Exclusion ---
-        # Modify dirs in-place to prevent os.walk from traversing excluded directories
-        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRECTORIES and not d.startswith('.')] # Also exclude hidden dirs
-
-        rel_dir = os.path.relpath(root, abs_input_dir)
-        if rel_dir == '.':
-            rel_dir = '' # Avoid './' prefix for root files
-
-        print(f"Processing directory: {os.path.join(input_dir, rel_dir) if rel_dir else input_dir}")
-
-        # Sort files for consistent order
-        files.sort()
-
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            abs_file_path = os.path.abspath(file_path)
-
-            # Skip if already processed (handles potential symlink complexities if followlinks=True)
-            if abs_file_path in processed_files:
-                continue
-
-            # Basic check for symlink loops, although followlinks=False is primary protection
-            if os.path.islink(file_path):
-                 print(f"  Skipping symlink: {filename}")
-                 continue
-
-            # Ensure it's actually a file
-            if not os.path.isfile(file_path):
-                 continue
-
-            rel_file_path = os.path.join(rel_dir, filename) if rel_dir else filename
-            _ , extension = os.path.splitext(filename)
-            extension_lower = extension.lower() # Normalize extension
-
-            # --- File Exclusion ---
-            # Check against excluded files/extensions
-            if (filename in EXCLUDED_FILES_OR_EXTENSIONS or
-                (extension_lower and extension_lower in EXCLUDED_FILES_OR_EXTENSIONS)):
-                print(f"  Skipping excluded file/type: {rel_file_path}")
-                continue
-
-            # Handle files without extension (like Dockerfile) or specific included names
-            is_includable_name = filename in INCLUDED_EXTENSIONS
-            # Check if the normalized extension is included
-            is_includable_ext = extension_lower in INCLUDED_EXTENSIONS
-
-            # --- File Inclusion ---
-            if not is_includable_ext and not is_includable_name:
-                print(f"  Skipping non-included file type: {rel_file_path}")
-                continue
-
-            # --- Read and Format File Content ---
-            print(f"  Processing file: {rel_file_path}")
-            content = get_file_content(file_path)
-
-            if content is not None:
-                processed_files.add(abs_file_path) # Mark as processed
-
-                # Determine language for Markdown code block
-                # Prioritize filename check (like 'Dockerfile'), then extension
-                lang_key = filename if is_includable_name else extension_lower
-                language = LANGUAGE_MAP.get(lang_key, '') # Default to empty (plain text)
-
-                # Format for Markdown - use forward slashes in paths for consistency
-                path_for_display = rel_file_path.replace(os.sep, '/')
-                output_content.append(f"--- File: {path_for_display} ---\n")
-                output_content.append(f"```{language}\n")
-                output_content.append(content)
-                # Ensure the code block fence is on a new line if the content doesn't end with one
-                if content and not content.endswith('\n'): # Check if content is not empty
-                    output_content.append('\n')
-                output_content.append("```\n\n") # Add extra newline for spacing
+    _dir_encoding_cache.clear() # Encodings detected by a previous run don't apply here
 
     # --- Write Output File ---
-    if not output_content: # Should not happen if header is always added, but safety check
-        print("Warning: No content was processed.")
-        return
-
+    # File blocks are streamed to the output as they are read instead of being
+    # joined into one large string first. The output is written in binary (UTF-8)
+    # so content read as UTF-8 is copied through without decoding and re-encoding.
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("".join(output_content)) # Write header and all file contents
+        with open(output_file, 'wb', buffering=1 << 20) as out: # 1 MiB buffer
+            out.write(create_llm_header(abs_input_dir).encode('utf-8'))
+            if jobs == 1:
+                _write_directory_files(out, input_dir, abs_input_dir, '', abs_output_file)
+            else:
+                _write_directory_files_parallel(out, input_dir, abs_input_dir, abs_output_file,
+                                                jobs or os.cpu_count() or 1)
         print(f"\nSuccessfully created context file: {os.path.abspath(output_file)}")
         # Provide size information
         try:
@@ -288,7 +664,18 @@ def process_directory(input_dir, output_file):
         print(f"\nError: An unexpected error occurred while writing the output file. Reason: {e}")
 
 
-if __name__ == "__main__":
+def _non_negative_int(value):
+    """argparse type for --jobs: an integer that is 0 or more."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {number}")
+    return number
+
+def main(argv=None):
+    """Command-line entry point; argv defaults to sys.argv[1:]."""
     parser = argparse.ArgumentParser(
         description="Combine code files from a project directory into a single Markdown-formatted text file for LLM context.",
         formatter_class=argparse.RawTextHelpFormatter # Keep newlines in help message
@@ -302,12 +689,23 @@ if __name__ == "__main__":
         default="project_context.md", # Changed default extension to .md
         help="Path to the output Markdown file (default: project_context.md in the current directory)."
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=_non_negative_int,
+        default=1,
+        help="Number of worker processes; top-level subdirectories are processed in parallel.\n"
+             "Useful for very large trees (default: 1, 0 = one per CPU)."
+    )
     # Removed --no-chardet as chardet is now conditionally handled
     # You could add it back if you want an explicit way to disable even if installed
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # No need for conditional import here anymore, handled at the top.
     # The detect_encoding function will adapt based on _CHARDET_AVAILABLE.
 
-    process_directory(args.input_dir, args.output)
\ No newline at end of file
+    process_directory(args.input_dir, args.output, args.jobs)
+
+
+if __name__ == "__main__":
+    main()